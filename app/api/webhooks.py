@@ -1,15 +1,13 @@
-from fastapi import APIRouter, Request
-from app.core.incident import IncidentService
-from app.core.schemas import AlertmanagerPayload
+from fastapi import APIRouter, HTTPException, Request
 
 router = APIRouter()
 
 @router.post("/alertmanager")
 async def alertmanager_webhook(req: Request):
-    payload_json = await req.json()
-    payload = AlertmanagerPayload.model_validate(payload_json)
-
-    service = IncidentService()
-    incident = await service.handle_alertmanager(payload)
-
-    return {"status": "ok", "incident_id": incident.incident_id}
+    service = req.app.state.incident_service
+    try:
+        payload_json = await req.json()
+        return await service.ingest_alertmanager(payload_json)
+    except ValueError as e:
+        # malformed JSON / payloads are rejected before spooling
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,24 +1,127 @@
+import asyncio
 import uuid
 from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 
 from app.core.schemas import AlertmanagerPayload, Incident
 from app.collectors.k8s_collector import K8sCollector
 from app.integrations.slack_client import SlackNotifier
 from app.storage.sqlite_store import IncidentStore
+from app.storage.spool import IngestSpool, get_spool
 from app.runbooks.router import classify_incident
 
 class IncidentService:
-    def __init__(self):
-        self.store = IncidentStore()
-        self.slack = SlackNotifier()
-        self.k8s = K8sCollector()
+    def __init__(
+        self,
+        store: Optional[IncidentStore] = None,
+        slack: Optional[SlackNotifier] = None,
+        k8s: Optional[K8sCollector] = None,
+        spool: Optional[IngestSpool] = None,
+    ):
+        self.store = store or IncidentStore()
+        self.slack = slack or SlackNotifier()
+        self.k8s = k8s or K8sCollector()
+        self.spool = spool or get_spool()
 
-    async def handle_alertmanager(self, payload: AlertmanagerPayload) -> Incident:
+    async def ingest_alertmanager(self, payload_json: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Validate and durably spool the payload, then run the pipeline.
+        Once the spool row is committed the alert counts as accepted: pipeline
+        failures leave the row for the background retry loop instead of failing
+        the webhook (which would make Alertmanager retry and spool a duplicate).
+        """
+        payload = AlertmanagerPayload.model_validate(payload_json)
+        if not payload.alerts:
+            raise ValueError("Alertmanager payload has no alerts")
+
+        entry = self.spool.append("alertmanager", payload_json)
+        incident = await self._process_entry(entry, payload)
+        status = "ok" if incident else "queued"
+        return {"status": status, "incident_id": entry["incident_id"]}
+
+    async def recover_spool(self) -> Dict[str, int]:
+        """
+        Retry due entries and those orphaned by a dead worker. Run periodically;
+        safe to run from several workers at once.
+        """
+        counts = {"recovered": 0, "failed": 0, "skipped": 0}
+        self.spool.heartbeat()
+        self.spool.requeue_orphaned()
+        for entry in self.spool.due():
+            if not self.spool.claim(entry["id"]):
+                counts["skipped"] += 1
+                continue
+            entry = self.spool.get(entry["id"])
+            try:
+                payload = AlertmanagerPayload.model_validate(entry["payload"])
+            except ValueError as e:
+                # retrying can't fix a payload that doesn't validate
+                self.spool.mark_dead(entry["id"], str(e))
+                counts["failed"] += 1
+                continue
+            incident = await self._process_entry(entry, payload)
+            counts["recovered" if incident else "failed"] += 1
+            # keep our claims alive and let the server handle requests between entries
+            self.spool.heartbeat()
+            await asyncio.sleep(0)
+        return counts
+
+    def replay_history(self, target: IncidentStore, since_id: int = 0) -> Dict[str, int]:
+        """
+        Re-run spooled payloads into `target` (a separate IncidentStore) for offline analysis.
+        No k8s calls, no Slack posts, and spool rows are left untouched.
+        """
+        counts = {"replayed": 0, "failed": 0}
+        for entry in self.spool.iter_entries(since_id=since_id):
+            try:
+                payload = AlertmanagerPayload.model_validate(entry["payload"])
+                received_at = datetime.fromisoformat(entry["received_at"]).replace(tzinfo=timezone.utc)
+                incident = self._build_incident(payload, entry["incident_id"], fallback_started_at=received_at)
+                target.upsert_incident(incident)
+                counts["replayed"] += 1
+            except Exception as e:
+                print(f"[spool] history replay failed id={entry['id']}: {e}")
+                counts["failed"] += 1
+        return counts
+
+    async def _process_entry(self, entry: Dict[str, Any], payload: AlertmanagerPayload) -> Optional[Incident]:
+        try:
+            incident = await self.handle_alertmanager(payload, incident_id=entry["incident_id"], announce=False)
+            # record the brief on the spool row before posting so a replay can't post it again;
+            # only a process death between the two leaves the flag set without a brief
+            if self.spool.mark_brief_posted(entry["id"]):
+                try:
+                    self._announce(incident)
+                except Exception:
+                    self.spool.clear_brief_posted(entry["id"])
+                    raise
+        except Exception as e:
+            status = self.spool.mark_failed(entry["id"], str(e))
+            print(f"[spool] processing failed id={entry['id']} incident_id={entry['incident_id']} status={status}: {e}")
+            return None
+        self.spool.mark_done(entry["id"])
+        return incident
+
+    async def handle_alertmanager(
+        self, payload: AlertmanagerPayload, incident_id: Optional[str] = None, announce: bool = True
+    ) -> Incident:
+        incident = self._build_incident(payload, incident_id or str(uuid.uuid4())[:8])
+        incident.evidence["k8s"] = self.k8s.collect_basic(namespace=incident.namespace, service=incident.service)
+
+        # persist incident first
+        self.store.upsert_incident(incident)
+
+        if announce:
+            self._announce(incident)
+        return incident
+
+    def _build_incident(
+        self, payload: AlertmanagerPayload, incident_id: str, fallback_started_at: Optional[datetime] = None
+    ) -> Incident:
         alert = payload.alerts[0]
         labels = {**payload.commonLabels, **alert.labels}
         annotations = {**payload.commonAnnotations, **alert.annotations}
 
-        incident_id = str(uuid.uuid4())[:8]
         env = "dev"
         service = labels.get("service", labels.get("app", "unknown-service"))
         namespace = labels.get("namespace", "default")
@@ -36,21 +139,17 @@ class IncidentService:
             service=service,
             namespace=namespace,
             alertname=alertname,
-            started_at=alert.startsAt or datetime.now(timezone.utc).isoformat(),
+            started_at=alert.startsAt or (fallback_started_at or datetime.now(timezone.utc)).isoformat(),
             raw={"labels": labels, "annotations": annotations, "status": alert.status},
             evidence={}
         )
 
         classification = classify_incident(incident)
         incident.evidence["classification"] = classification
-        incident.evidence["k8s"] = self.k8s.collect_basic(namespace=namespace, service=service)
-
-        # persist incident first
-        self.store.upsert_incident(incident)
+        return incident
 
+    def _announce(self, incident: Incident) -> None:
         # post to Slack and store message metadata for later updates
         meta = self.slack.post_incident_brief(incident)
         if meta and meta.get("channel") and meta.get("ts"):
-            self.store.set_slack_meta(incident_id, meta["channel"], meta["ts"])
-
-        return incident
+            self.store.set_slack_meta(incident.incident_id, meta["channel"], meta["ts"])
@@ -1,10 +1,52 @@
 from dotenv import load_dotenv
 load_dotenv(".env")  # load environment variables for local dev
 
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from app.api.webhooks import router as webhook_router
+from app.core.incident import IncidentService
+from app.storage.spool import close_spool
 from app.integrations.slack_interactive import router as slack_router
 
-app = FastAPI(title="On-call Autoresponder", version="0.2.0")
+SPOOL_POLL_SECONDS = float(os.getenv("SPOOL_POLL_SECONDS", "15"))
+
+async def run_spool_worker(service: IncidentService, interval: float = SPOOL_POLL_SECONDS) -> None:
+    # retry failed alerts, pick up work orphaned by crashed workers, and compact finished entries
+    while True:
+        try:
+            counts = await service.recover_spool()
+            removed = service.spool.compact()
+            if any(counts.values()) or removed:
+                print(
+                    f"[spool] recovered={counts['recovered']} failed={counts['failed']} "
+                    f"skipped={counts['skipped']} compacted={removed}"
+                )
+        except Exception as e:
+            # e.g. "database is locked" while another worker writes; try again next round
+            print(f"[spool] worker iteration failed: {e!r}")
+        await asyncio.sleep(interval)
+
+def _log_worker_exit(task: asyncio.Task) -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        print(f"[spool] worker stopped: {exc!r}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.incident_service = IncidentService()
+    worker = asyncio.create_task(run_spool_worker(app.state.incident_service))
+    worker.add_done_callback(_log_worker_exit)
+    yield
+    worker.cancel()
+    with suppress(asyncio.CancelledError):
+        await worker
+    close_spool()
+
+app = FastAPI(title="On-call Autoresponder", version="0.2.0", lifespan=lifespan)
 app.include_router(webhook_router, prefix="/webhooks")
 app.include_router(slack_router, prefix="/integrations")
@@ -0,0 +1,315 @@
+import json
+import os
+import socket
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.storage.sqlite_store import DB_PATH
+
+SPOOL_RETENTION_DAYS = int(os.getenv("SPOOL_RETENTION_DAYS", "7"))
+SPOOL_MAX_ATTEMPTS = int(os.getenv("SPOOL_MAX_ATTEMPTS", "8"))
+# base delay for retrying a failed entry; doubles per attempt, capped at an hour
+SPOOL_RETRY_SECONDS = int(os.getenv("SPOOL_RETRY_SECONDS", "30"))
+# an owner whose heartbeat is older than this is treated as dead and its claims are released
+SPOOL_LEASE_SECONDS = int(os.getenv("SPOOL_LEASE_SECONDS", "120"))
+
+class IngestSpool:
+    """
+    Append-only record of accepted webhook payloads.
+
+    Entries are written (and fsynced) before the webhook acknowledges, so a
+    crash mid-pipeline leaves an unfinished row that is retried under the
+    incident_id it was given at append time.
+
+    Row lifecycle: processing -> done, or processing -> pending (retry with
+    backoff) -> ... -> dead once SPOOL_MAX_ATTEMPTS is reached. Each process
+    registers itself as an owner with a heartbeat; rows are claimed atomically
+    by an owner, and claims held by a dead owner are released back to pending.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = DB_PATH,
+        max_attempts: int = SPOOL_MAX_ATTEMPTS,
+        retry_seconds: int = SPOOL_RETRY_SECONDS,
+    ):
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.owner_id = str(uuid.uuid4())
+        self.conn = sqlite3.connect(db_path)
+        # WAL + NORMAL: bookkeeping commits survive a process crash without an fsync each;
+        # append() alone switches to FULL so an acknowledged payload also survives power loss
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init()
+        self._register_owner()
+
+    def _init(self):
+        cur = self.conn.cursor()
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_spool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT,
+            incident_id TEXT,
+            payload_json TEXT,
+            status TEXT DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            brief_posted INTEGER DEFAULT 0,
+            received_at TEXT DEFAULT (datetime('now')),
+            claimed_at TEXT,
+            claimed_by TEXT,
+            retry_at TEXT,
+            done_at TEXT
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_spool_owners (
+            owner_id TEXT PRIMARY KEY,
+            host TEXT,
+            pid INTEGER,
+            heartbeat_at TEXT
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ingest_spool_status ON ingest_spool (status, id)")
+        self.conn.commit()
+        self._migrate_spool_columns()
+
+    def _migrate_spool_columns(self) -> None:
+        # Add columns introduced after the first spool schema if missing
+        cur = self.conn.cursor()
+        cur.execute("PRAGMA table_info(ingest_spool)")
+        cols = {row[1] for row in cur.fetchall()}
+
+        if "brief_posted" not in cols:
+            cur.execute("ALTER TABLE ingest_spool ADD COLUMN brief_posted INTEGER DEFAULT 0")
+        if "claimed_at" not in cols:
+            cur.execute("ALTER TABLE ingest_spool ADD COLUMN claimed_at TEXT")
+        if "claimed_by" not in cols:
+            cur.execute("ALTER TABLE ingest_spool ADD COLUMN claimed_by TEXT")
+        if "retry_at" not in cols:
+            cur.execute("ALTER TABLE ingest_spool ADD COLUMN retry_at TEXT")
+
+        self.conn.commit()
+
+    def _register_owner(self) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ingest_spool_owners (owner_id, host, pid, heartbeat_at) "
+            "VALUES (?,?,?,datetime('now'))",
+            (self.owner_id, socket.gethostname(), os.getpid()),
+        )
+        self.conn.commit()
+
+    def heartbeat(self) -> None:
+        self.conn.execute(
+            "UPDATE ingest_spool_owners SET heartbeat_at=datetime('now') WHERE owner_id=?",
+            (self.owner_id,),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Release this owner's claims (e.g. a cancelled recovery) and deregister it."""
+        self.conn.execute(
+            "UPDATE ingest_spool SET status='pending', claimed_by=NULL WHERE status='processing' AND claimed_by=?",
+            (self.owner_id,),
+        )
+        self.conn.execute("DELETE FROM ingest_spool_owners WHERE owner_id=?", (self.owner_id,))
+        self.conn.commit()
+        self.conn.close()
+
+    def append(self, source: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Durably record a payload (FULL fsync). The new row is already claimed by this owner."""
+        incident_id = str(uuid.uuid4())[:8]
+        cur = self.conn.cursor()
+        self.conn.execute("PRAGMA synchronous=FULL")
+        try:
+            cur.execute(
+                "INSERT INTO ingest_spool (source, incident_id, payload_json, status, attempts, claimed_at, claimed_by) "
+                "VALUES (?,?,?,'processing',1,datetime('now'),?)",
+                (source, incident_id, json.dumps(payload), self.owner_id),
+            )
+            self.conn.commit()
+        finally:
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        return self.get(cur.lastrowid)
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(f"SELECT {_COLUMNS} FROM ingest_spool WHERE id=?", (entry_id,)).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def claim(self, entry_id: int) -> bool:
+        """Atomically move a pending row to processing. False if another worker got it first."""
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE ingest_spool SET status='processing', attempts=attempts+1, "
+            "claimed_at=datetime('now'), claimed_by=? WHERE id=? AND status='pending'",
+            (self.owner_id, entry_id),
+        )
+        self.conn.commit()
+        return cur.rowcount == 1
+
+    def requeue_orphaned(self, lease_seconds: int = SPOOL_LEASE_SECONDS) -> int:
+        """
+        Return `processing` rows whose owner is gone to `pending`. An owner is gone if it
+        deregistered, its heartbeat is older than the lease, or it ran on this host
+        under a pid that no longer exists (a crash followed by a fast restart).
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT s.claimed_by, o.host, o.pid, "
+            "o.heartbeat_at < datetime('now', ?) "
+            "FROM ingest_spool s LEFT JOIN ingest_spool_owners o ON o.owner_id = s.claimed_by "
+            "WHERE s.status='processing'",
+            (f"-{int(lease_seconds)} seconds",),
+        ).fetchall()
+        host = socket.gethostname()
+        orphaned = [
+            owner for owner, owner_host, pid, expired in rows
+            if owner != self.owner_id
+            and (owner_host is None or expired or (owner_host == host and not _pid_alive(pid)))
+        ]
+
+        requeued = 0
+        for owner in orphaned:
+            cur = self.conn.cursor()
+            if owner is None:
+                cur.execute(
+                    "UPDATE ingest_spool SET status='pending', retry_at=NULL "
+                    "WHERE status='processing' AND claimed_by IS NULL"
+                )
+            else:
+                cur.execute(
+                    "UPDATE ingest_spool SET status='pending', retry_at=NULL, claimed_by=NULL "
+                    "WHERE status='processing' AND claimed_by=?",
+                    (owner,),
+                )
+                cur.execute("DELETE FROM ingest_spool_owners WHERE owner_id=?", (owner,))
+            requeued += cur.rowcount
+        self.conn.commit()
+        return requeued
+
+    def mark_brief_posted(self, entry_id: int) -> bool:
+        """
+        Record the Slack brief just before it is sent. Returns False if it was already
+        recorded, so a replay never posts twice. Callers must clear_brief_posted() when
+        the post fails; only a process death mid-post leaves the flag set without a brief.
+        """
+        cur = self.conn.cursor()
+        cur.execute("UPDATE ingest_spool SET brief_posted=1 WHERE id=? AND brief_posted=0", (entry_id,))
+        self.conn.commit()
+        return cur.rowcount == 1
+
+    def clear_brief_posted(self, entry_id: int) -> None:
+        self.conn.execute("UPDATE ingest_spool SET brief_posted=0 WHERE id=?", (entry_id,))
+        self.conn.commit()
+
+    def mark_done(self, entry_id: int) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            "UPDATE ingest_spool SET status='done', last_error=NULL, claimed_by=NULL, "
+            "done_at=datetime('now') WHERE id=?",
+            (entry_id,),
+        )
+        self.conn.commit()
+
+    def mark_failed(self, entry_id: int, error: str) -> str:
+        """Release a failed row for a backed-off retry, or park it as `dead` once attempts are exhausted."""
+        entry = self.get(entry_id)
+        if entry["attempts"] >= self.max_attempts:
+            self.mark_dead(entry_id, error)
+            return "dead"
+
+        delay = min(self.retry_seconds * 2 ** (entry["attempts"] - 1), 3600)
+        self.conn.execute(
+            "UPDATE ingest_spool SET status='pending', last_error=?, claimed_by=NULL, "
+            "retry_at=datetime('now', ?) WHERE id=?",
+            (error, f"+{int(delay)} seconds", entry_id),
+        )
+        self.conn.commit()
+        return "pending"
+
+    def mark_dead(self, entry_id: int, error: str) -> None:
+        """Park an entry that can never succeed; it is skipped by recovery and compacted later."""
+        self.conn.execute(
+            "UPDATE ingest_spool SET status='dead', last_error=?, claimed_by=NULL, "
+            "done_at=datetime('now') WHERE id=?",
+            (error, entry_id),
+        )
+        self.conn.commit()
+
+    def pending(self) -> List[Dict[str, Any]]:
+        return list(self.iter_entries(statuses=("pending",)))
+
+    def due(self) -> List[Dict[str, Any]]:
+        """Pending entries whose retry backoff has elapsed."""
+        rows = self.conn.execute(
+            f"SELECT {_COLUMNS} FROM ingest_spool WHERE status='pending' "
+            "AND (retry_at IS NULL OR retry_at <= datetime('now')) ORDER BY id"
+        ).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def iter_entries(self, statuses: Optional[tuple] = None, since_id: int = 0) -> Iterator[Dict[str, Any]]:
+        """Yield spooled entries in arrival order (read-only; also usable as an offline replay source)."""
+        sql = f"SELECT {_COLUMNS} FROM ingest_spool WHERE id>?"
+        params: List[Any] = [since_id]
+        if statuses:
+            sql += f" AND status IN ({','.join('?' for _ in statuses)})"
+            params.extend(statuses)
+        sql += " ORDER BY id"
+        for row in self.conn.execute(sql, params).fetchall():
+            yield _row_to_entry(row)
+
+    def compact(self, retention_days: int = SPOOL_RETENTION_DAYS) -> int:
+        """Drop done/dead entries older than the retention window. Unfinished rows are never removed."""
+        cur = self.conn.cursor()
+        cur.execute(
+            "DELETE FROM ingest_spool WHERE status IN ('done','dead') AND done_at < datetime('now', ?)",
+            (f"-{int(retention_days)} days",),
+        )
+        removed = cur.rowcount
+        self.conn.commit()
+        if removed:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+_COLUMNS = "id, source, incident_id, payload_json, status, attempts, last_error, brief_posted, received_at"
+
+def _row_to_entry(row) -> Dict[str, Any]:
+    return {
+        "id": row[0],
+        "source": row[1],
+        "incident_id": row[2],
+        "payload": json.loads(row[3] or "{}"),
+        "status": row[4],
+        "attempts": row[5],
+        "last_error": row[6],
+        "brief_posted": bool(row[7]),
+        "received_at": row[8],
+    }
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+_spool: Optional[IngestSpool] = None
+
+def get_spool() -> IngestSpool:
+    """Process-wide spool, so the PRAGMA/DDL setup and the connection happen once."""
+    global _spool
+    if _spool is None:
+        _spool = IngestSpool()
+    return _spool
+
+def close_spool() -> None:
+    global _spool
+    if _spool is not None:
+        _spool.close()
+        _spool = None
@@ -8,8 +8,8 @@ from app.core.schemas import Incident
 DB_PATH = Path("incidents.db")
 
 class IncidentStore:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_PATH)
+    def __init__(self, db_path: Path = DB_PATH):
+        self.conn = sqlite3.connect(db_path)
         self._init()
 
     def _init(self):
@@ -0,0 +1,205 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.incident import IncidentService
+from app.main import app
+from app.storage.spool import IngestSpool
+from app.storage.sqlite_store import IncidentStore
+
+PAYLOAD = {
+    "status": "firing",
+    "alerts": [{"status": "firing", "labels": {"alertname": "High5xxErrorRate", "service": "api", "namespace": "default"}}],
+}
+
+
+class StubSlack:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.posted = []
+
+    def post_incident_brief(self, incident):
+        if self.fail:
+            raise RuntimeError("slack down")
+        self.posted.append(incident.incident_id)
+        return {"channel": "C1", "ts": f"{len(self.posted)}.0"}
+
+
+class StubK8s:
+    def __init__(self):
+        self.calls = 0
+
+    def collect_basic(self, namespace, service):
+        self.calls += 1
+        return {"enabled": False}
+
+
+def make_service(tmp_path, slack=None, k8s=None, **spool_kwargs):
+    spool_kwargs.setdefault("retry_seconds", 0)
+    return IncidentService(
+        store=IncidentStore(db_path=tmp_path / "incidents.db"),
+        slack=slack or StubSlack(),
+        k8s=k8s or StubK8s(),
+        spool=IngestSpool(db_path=tmp_path / "incidents.db", **spool_kwargs),
+    )
+
+
+def test_ingest_spools_before_processing(tmp_path):
+    service = make_service(tmp_path)
+    seen = []
+
+    async def handle(payload, incident_id=None, announce=True):
+        seen.extend(service.spool.iter_entries())
+        raise RuntimeError("stop after spooling")
+
+    service.handle_alertmanager = handle
+    result = asyncio.run(service.ingest_alertmanager(PAYLOAD))
+
+    assert len(seen) == 1
+    assert seen[0]["incident_id"] == result["incident_id"]
+    assert seen[0]["payload"] == PAYLOAD
+
+
+def test_failed_pipeline_is_acknowledged_and_left_pending(tmp_path):
+    service = make_service(tmp_path, slack=StubSlack(fail=True))
+    result = asyncio.run(service.ingest_alertmanager(PAYLOAD))
+
+    assert result["status"] == "queued"
+    [entry] = service.spool.pending()
+    assert entry["incident_id"] == result["incident_id"]
+    assert entry["last_error"] == "slack down"
+
+
+def test_recover_after_crash_and_immediate_restart(tmp_path):
+    crashed = make_service(tmp_path)
+    crashed.handle_alertmanager = _crashing_handler()
+    with pytest.raises(SystemExit):
+        asyncio.run(crashed.ingest_alertmanager(PAYLOAD))
+    [entry] = crashed.spool.iter_entries(statuses=("processing",))
+
+    # the crashed process is gone; its heartbeat is still fresh
+    crashed.spool.conn.execute(
+        "UPDATE ingest_spool_owners SET pid=? WHERE owner_id=?", (_dead_pid(), crashed.spool.owner_id)
+    )
+    crashed.spool.conn.commit()
+
+    restarted = make_service(tmp_path)
+    counts = asyncio.run(restarted.recover_spool())
+
+    assert counts["recovered"] == 1
+    assert restarted.slack.posted == [entry["incident_id"]]
+    assert restarted.store.get_slack_meta(entry["incident_id"]) is not None
+    assert restarted.spool.get(entry["id"])["status"] == "done"
+
+
+def test_failed_brief_is_posted_on_retry(tmp_path):
+    slack = StubSlack(fail=True)
+    service = make_service(tmp_path, slack=slack)
+    result = asyncio.run(service.ingest_alertmanager(PAYLOAD))
+    assert result["status"] == "queued"
+
+    slack.fail = False
+    counts = asyncio.run(service.recover_spool())
+
+    assert counts["recovered"] == 1
+    assert slack.posted == [result["incident_id"]]
+
+
+def test_recover_skips_brief_already_posted(tmp_path):
+    # brief was sent, then the process died before the row was closed
+    service = make_service(tmp_path)
+    entry = service.spool.append("alertmanager", PAYLOAD)
+    service.spool.mark_brief_posted(entry["id"])
+    service.spool.mark_failed(entry["id"], "crashed")
+
+    counts = asyncio.run(service.recover_spool())
+
+    assert counts["recovered"] == 1
+    assert service.slack.posted == []
+    assert service.spool.get(entry["id"])["status"] == "done"
+
+
+def test_ingest_rejects_empty_alerts(tmp_path):
+    service = make_service(tmp_path)
+    with pytest.raises(ValueError):
+        asyncio.run(service.ingest_alertmanager({"status": "firing", "alerts": []}))
+    assert list(service.spool.iter_entries()) == []
+
+
+def test_invalid_spooled_payload_goes_dead_immediately(tmp_path):
+    service = make_service(tmp_path)
+    entry = service.spool.append("alertmanager", {"alerts": "not-a-list"})
+    service.spool.mark_failed(entry["id"], "crashed")
+
+    assert asyncio.run(service.recover_spool())["failed"] == 1
+    assert service.spool.get(entry["id"])["status"] == "dead"
+
+
+def test_poison_entry_goes_dead_and_is_not_retried(tmp_path):
+    service = make_service(tmp_path, max_attempts=2)
+    # spooled by an older build that did not reject empty alerts
+    entry = service.spool.append("alertmanager", {"status": "firing", "alerts": []})
+    service.spool.mark_failed(entry["id"], "crashed")
+
+    asyncio.run(service.recover_spool())
+    assert service.spool.get(entry["id"])["status"] == "dead"
+    assert asyncio.run(service.recover_spool())["failed"] == 0
+
+
+def test_replay_history_has_no_side_effects(tmp_path):
+    service = make_service(tmp_path)
+    result = asyncio.run(service.ingest_alertmanager(PAYLOAD))
+    before = list(service.spool.iter_entries())
+    service.slack.posted.clear()
+    service.k8s.calls = 0
+
+    target = IncidentStore(db_path=tmp_path / "replay.db")
+    counts = service.replay_history(target)
+
+    assert counts == {"replayed": 1, "failed": 0}
+    row = target.conn.execute("SELECT incident_id, service, started_at FROM incidents").fetchone()
+    assert row[:2] == (result["incident_id"], "api")
+    # no startsAt in the payload: falls back to when the alert was spooled, not replay time
+    assert row[2] == before[0]["received_at"].replace(" ", "T") + "+00:00"
+    assert service.slack.posted == []
+    assert service.k8s.calls == 0
+    assert list(service.spool.iter_entries()) == before
+
+
+def test_alertmanager_webhook(tmp_path, monkeypatch):
+    slack = StubSlack()
+    # built by the app's lifespan, on the server's thread
+    monkeypatch.setattr("app.main.IncidentService", lambda: make_service(tmp_path, slack=slack))
+    with TestClient(app) as client:
+        resp = client.post("/webhooks/alertmanager", json=PAYLOAD)
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "ok"
+
+        slack.fail = True
+        resp = client.post("/webhooks/alertmanager", json=PAYLOAD)
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "queued"
+
+        resp = client.post("/webhooks/alertmanager", json={"status": "firing", "alerts": []})
+        assert resp.status_code == 400
+
+        resp = client.post(
+            "/webhooks/alertmanager", content=b"{not json", headers={"Content-Type": "application/json"}
+        )
+        assert resp.status_code == 400
+
+
+def _crashing_handler():
+    async def handle(payload, incident_id=None, announce=True):
+        # BaseException escapes _process_entry like a process death would
+        raise SystemExit("killed mid-pipeline")
+    return handle
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
@@ -0,0 +1,88 @@
+from app.storage.spool import IngestSpool
+
+
+def test_spool_tracks_entries_until_done(tmp_path):
+    spool = IngestSpool(db_path=tmp_path / "spool.db")
+    first = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    second = spool.append("alertmanager", {"status": "resolved", "alerts": []})
+    assert first["status"] == "processing"
+
+    assert spool.mark_failed(first["id"], "boom") == "pending"
+    spool.mark_done(second["id"])
+
+    pending = spool.pending()
+    assert [e["id"] for e in pending] == [first["id"]]
+    assert pending[0]["incident_id"] == first["incident_id"]
+    assert pending[0]["payload"]["status"] == "firing"
+    assert pending[0]["last_error"] == "boom"
+
+    # survives reopening the file
+    reopened = IngestSpool(db_path=tmp_path / "spool.db")
+    assert [e["id"] for e in reopened.iter_entries()] == [first["id"], second["id"]]
+
+
+def test_spool_claim_is_exclusive(tmp_path):
+    worker_a = IngestSpool(db_path=tmp_path / "spool.db")
+    worker_b = IngestSpool(db_path=tmp_path / "spool.db")
+    entry = worker_a.append("alertmanager", {"status": "firing", "alerts": []})
+    worker_a.mark_failed(entry["id"], "boom")
+
+    assert worker_a.claim(entry["id"]) is True
+    assert worker_b.claim(entry["id"]) is False
+
+
+def test_spool_requeues_claims_of_expired_owner(tmp_path):
+    crashed = IngestSpool(db_path=tmp_path / "spool.db")
+    entry = crashed.append("alertmanager", {"status": "firing", "alerts": []})
+    survivor = IngestSpool(db_path=tmp_path / "spool.db")
+    assert survivor.requeue_orphaned(lease_seconds=120) == 0
+
+    crashed.conn.execute("UPDATE ingest_spool_owners SET heartbeat_at=datetime('now', '-1 hours')")
+    crashed.conn.commit()
+    survivor.heartbeat()
+    assert survivor.requeue_orphaned(lease_seconds=120) == 1
+    assert [e["id"] for e in survivor.due()] == [entry["id"]]
+
+
+def test_spool_close_releases_own_claims(tmp_path):
+    spool = IngestSpool(db_path=tmp_path / "spool.db")
+    entry = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    spool.close()
+
+    reopened = IngestSpool(db_path=tmp_path / "spool.db")
+    assert [e["id"] for e in reopened.due()] == [entry["id"]]
+
+
+def test_spool_failed_entries_back_off(tmp_path):
+    spool = IngestSpool(db_path=tmp_path / "spool.db", retry_seconds=30)
+    entry = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    spool.mark_failed(entry["id"], "boom")
+
+    assert [e["id"] for e in spool.pending()] == [entry["id"]]
+    assert spool.due() == []
+
+
+def test_spool_dead_after_max_attempts(tmp_path):
+    spool = IngestSpool(db_path=tmp_path / "spool.db", max_attempts=2)
+    entry = spool.append("alertmanager", {"status": "firing", "alerts": []})
+
+    assert spool.mark_failed(entry["id"], "boom") == "pending"
+    assert spool.claim(entry["id"])
+    assert spool.mark_failed(entry["id"], "boom") == "dead"
+    assert spool.pending() == []
+
+
+def test_spool_compact_keeps_unfinished(tmp_path):
+    spool = IngestSpool(db_path=tmp_path / "spool.db", max_attempts=1)
+    dead = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    assert spool.mark_failed(dead["id"], "poison") == "dead"
+    spool.max_attempts = 5
+    keep = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    spool.mark_failed(keep["id"], "retry me")
+    done = spool.append("alertmanager", {"status": "firing", "alerts": []})
+    spool.mark_done(done["id"])
+    spool.conn.execute("UPDATE ingest_spool SET done_at=datetime('now', '-30 days') WHERE status IN ('done','dead')")
+    spool.conn.commit()
+
+    assert spool.compact(retention_days=7) == 2
+    assert [e["id"] for e in spool.iter_entries()] == [keep["id"]]